@@ -0,0 +1,277 @@
+import os
+import json
+import hashlib
+import sqlite3
+import threading
+from contextlib import contextmanager
+import numpy as np
+from typing import Dict, List, Any, Optional
+from openai_client import get_openai_client
+
+# Location of the SQLite cache database
+CACHE_DB_PATH = os.getenv("CACHE_DB_PATH", "call_summary_cache.db")
+
+# Bumped whenever the table layout changes; databases with another version are recreated
+CACHE_SCHEMA_VERSION = 2
+
+# Embedding model and minimum cosine similarity for reusing a summary
+EMBEDDING_MODEL = "text-embedding-3-small"
+SIMILARITY_THRESHOLD = 0.95
+
+# Keep the embedding input within the model's 8k token limit, assuming ~2 characters per
+# token so non-English transcripts fit too; longer transcripts are represented by
+# EMBEDDING_SAMPLES evenly spaced excerpts rather than their opening
+MAX_EMBEDDING_CHARS = 15000
+EMBEDDING_SAMPLES = 10
+
+# Only transcripts whose lengths differ by at most this fraction can share a summary
+LENGTH_TOLERANCE = 0.1
+
+# Number of transcript embeddings kept; the oldest are evicted beyond this
+MAX_TRANSCRIPT_EMBEDDINGS = int(os.getenv("MAX_TRANSCRIPT_EMBEDDINGS", 10000))
+
+class _EmbeddingIndex:
+    """Per-process copy of the stored embeddings, kept in sync with the database."""
+    
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.ids = np.empty(0, dtype=np.int64)
+        self.scopes = np.empty(0, dtype="U64")
+        self.lengths = np.empty(0, dtype=np.int64)
+        self.matrix: Optional[np.ndarray] = None
+
+_index = _EmbeddingIndex()
+
+def cache_scope(api_key: Optional[str]) -> str:
+    """
+    Get the cache partition for an API key.
+    
+    Every cached entry belongs to the key that produced it, so callers using different
+    keys never receive each other's transcripts or summaries.
+    
+    Args:
+        api_key: OpenAI API key of the request, or None when no key is configured
+        
+    Returns:
+        SHA-256 hex digest of the key
+    """
+    return hashlib.sha256((api_key or "").encode()).hexdigest()
+
+def _create_schema(conn: sqlite3.Connection) -> None:
+    """
+    Create the cache tables, replacing those of an older layout.
+    
+    Cached data can always be regenerated, so old tables are dropped rather than migrated.
+    
+    Args:
+        conn: Open cache database connection
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # Another process may have upgraded the database while we waited for the lock
+        if conn.execute("PRAGMA user_version").fetchone()[0] != CACHE_SCHEMA_VERSION:
+            for table in ("results", "summary_embeddings", "transcript_embeddings"):
+                conn.execute(f"DROP TABLE IF EXISTS {table}")
+            conn.execute(
+                "CREATE TABLE results ("
+                "scope TEXT, audio_hash TEXT, transcript TEXT, summary TEXT, titles TEXT, "
+                "PRIMARY KEY (scope, audio_hash))"
+            )
+            conn.execute(
+                "CREATE TABLE transcript_embeddings ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, scope TEXT, transcript_length INTEGER, "
+                "embedding BLOB, summary TEXT)"
+            )
+            conn.execute(f"PRAGMA user_version = {CACHE_SCHEMA_VERSION}")
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+@contextmanager
+def _connect():
+    """
+    Open a connection to the cache database, creating the tables if needed.
+    
+    The transaction is committed on success and the connection is always closed.
+    
+    Yields:
+        SQLite connection
+    """
+    conn = sqlite3.connect(CACHE_DB_PATH, timeout=30)
+    try:
+        if conn.execute("PRAGMA user_version").fetchone()[0] != CACHE_SCHEMA_VERSION:
+            _create_schema(conn)
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+def get_cached_result(audio_hash: str, scope: str) -> Optional[Dict[str, Any]]:
+    """
+    Look up a previously processed recording by its content hash.
+    
+    Args:
+        audio_hash: SHA-256 hex digest of the audio file
+        scope: Cache partition of the request, from cache_scope
+        
+    Returns:
+        Dictionary with summary, suggested_titles and full_transcript, or None on a miss
+    """
+    with _connect() as conn:
+        row = conn.execute(
+            "SELECT transcript, summary, titles FROM results WHERE scope = ? AND audio_hash = ?",
+            (scope, audio_hash)
+        ).fetchone()
+    
+    if row is None:
+        return None
+    
+    transcript, summary, titles = row
+    return {
+        "summary": summary,
+        "suggested_titles": json.loads(titles),
+        "full_transcript": transcript
+    }
+
+def store_result(audio_hash: str, scope: str, transcript: str, summary: str, titles: List[str]) -> None:
+    """
+    Store the processing result for a recording.
+    
+    Args:
+        audio_hash: SHA-256 hex digest of the audio file
+        scope: Cache partition of the request, from cache_scope
+        transcript: The full transcript
+        summary: The generated summary
+        titles: The suggested titles
+    """
+    with _connect() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO results (scope, audio_hash, transcript, summary, titles) VALUES (?, ?, ?, ?, ?)",
+            (scope, audio_hash, transcript, summary, json.dumps(titles))
+        )
+
+async def embed_transcript(transcript: str, api_key: Optional[str] = None) -> np.ndarray:
+    """
+    Embed a cleaned transcript for semantic cache lookups.
+    
+    Transcripts longer than MAX_EMBEDDING_CHARS are embedded from excerpts spread over
+    the whole text, so recordings that only share an opening do not look identical.
+    
+    Args:
+        transcript: The cleaned transcript
+        api_key: OpenAI API key
+        
+    Returns:
+        Unit-length float32 embedding vector
+    """
+    if len(transcript) > MAX_EMBEDDING_CHARS:
+        sample_length = MAX_EMBEDDING_CHARS // EMBEDDING_SAMPLES
+        starts = np.linspace(0, len(transcript) - sample_length, EMBEDDING_SAMPLES).astype(int)
+        transcript = " ".join(transcript[start:start + sample_length] for start in starts)
+    
+    client = get_openai_client(api_key)
+    response = await client.embeddings.create(
+        model=EMBEDDING_MODEL,
+        input=transcript
+    )
+    
+    embedding = np.asarray(response.data[0].embedding, dtype=np.float32)
+    return embedding / np.linalg.norm(embedding)
+
+def _sync_index(conn: sqlite3.Connection) -> None:
+    """
+    Bring the in-memory embedding index up to date with the database.
+    
+    Only rows added since the last sync are read; rows evicted by any process are dropped.
+    Must be called with _index.lock held.
+    
+    Args:
+        conn: Open cache database connection
+    """
+    min_id, max_id = conn.execute("SELECT MIN(id), MAX(id) FROM transcript_embeddings").fetchone()
+    
+    # Start over if the table is empty or was recreated
+    if max_id is None or (len(_index.ids) and _index.ids[-1] > max_id):
+        _index.ids = np.empty(0, dtype=np.int64)
+        _index.scopes = np.empty(0, dtype="U64")
+        _index.lengths = np.empty(0, dtype=np.int64)
+        _index.matrix = None
+        if max_id is None:
+            return
+    
+    # Drop rows that have been evicted
+    if len(_index.ids) and _index.ids[0] < min_id:
+        keep = _index.ids >= min_id
+        _index.ids = _index.ids[keep]
+        _index.scopes = _index.scopes[keep]
+        _index.lengths = _index.lengths[keep]
+        _index.matrix = _index.matrix[keep]
+    
+    # Append rows stored since the last sync
+    last_id = int(_index.ids[-1]) if len(_index.ids) else 0
+    if max_id > last_id:
+        rows = conn.execute(
+            "SELECT id, scope, transcript_length, embedding FROM transcript_embeddings WHERE id > ? ORDER BY id",
+            (last_id,)
+        ).fetchall()
+        new_matrix = np.stack([np.frombuffer(row[3], dtype=np.float32) for row in rows])
+        _index.ids = np.concatenate([_index.ids, np.array([row[0] for row in rows], dtype=np.int64)])
+        _index.scopes = np.concatenate([_index.scopes, np.array([row[1] for row in rows], dtype="U64")])
+        _index.lengths = np.concatenate([_index.lengths, np.array([row[2] for row in rows], dtype=np.int64)])
+        _index.matrix = new_matrix if _index.matrix is None else np.concatenate([_index.matrix, new_matrix])
+
+def find_similar_summary(embedding: np.ndarray, scope: str, transcript_length: int) -> Optional[str]:
+    """
+    Find the stored summary of the most similar transcript of about the same length.
+    
+    Only summaries stored under the same scope are considered.
+    
+    Args:
+        embedding: Unit-length embedding of the transcript
+        scope: Cache partition of the request, from cache_scope
+        transcript_length: Length of the cleaned transcript in characters
+        
+    Returns:
+        The stored summary if its cosine similarity reaches SIMILARITY_THRESHOLD, otherwise None
+    """
+    with _connect() as conn:
+        with _index.lock:
+            _sync_index(conn)
+            if not len(_index.ids):
+                return None
+            
+            # Embeddings are stored normalised, so the dot product is the cosine similarity
+            similarities = _index.matrix @ embedding
+            length_gap = np.abs(_index.lengths - transcript_length)
+            similarities[length_gap > LENGTH_TOLERANCE * np.maximum(_index.lengths, transcript_length)] = -1.0
+            similarities[_index.scopes != scope] = -1.0
+            best = int(np.argmax(similarities))
+            if similarities[best] < SIMILARITY_THRESHOLD:
+                return None
+            best_id = int(_index.ids[best])
+        
+        row = conn.execute("SELECT summary FROM transcript_embeddings WHERE id = ?", (best_id,)).fetchone()
+    
+    return row[0] if row else None
+
+def store_summary_embedding(embedding: np.ndarray, scope: str, summary: str, transcript_length: int) -> None:
+    """
+    Store a transcript embedding together with its summary, evicting the oldest entries
+    beyond MAX_TRANSCRIPT_EMBEDDINGS.
+    
+    Args:
+        embedding: Unit-length embedding of the transcript
+        scope: Cache partition of the request, from cache_scope
+        summary: The generated summary
+        transcript_length: Length of the cleaned transcript in characters
+    """
+    with _connect() as conn:
+        cursor = conn.execute(
+            "INSERT INTO transcript_embeddings (scope, transcript_length, embedding, summary) VALUES (?, ?, ?, ?)",
+            (scope, transcript_length, embedding.astype(np.float32).tobytes(), summary)
+        )
+        conn.execute(
+            "DELETE FROM transcript_embeddings WHERE id <= ?",
+            (cursor.lastrowid - MAX_TRANSCRIPT_EMBEDDINGS,)
+        )
\ No newline at end of file
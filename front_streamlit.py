@@ -1,17 +1,84 @@
 import streamlit as st
 import requests
-import os
-import tempfile
 import json
 import time
 from datetime import datetime
 
+# Try to import requests_toolbelt for streamed uploads, but fall back to requests' own multipart
+try:
+    from requests_toolbelt import MultipartEncoder
+    has_toolbelt = True
+except ImportError:
+    has_toolbelt = False
+
 st.set_page_config(
     page_title="Call Summary Generator",
     page_icon="🎙️",
     layout="wide"
 )
 
+# Progress and status shown once each streamed stage has arrived
+STAGE_PROGRESS = {
+    "transcript": (50, "Step 2/3: Generating summary..."),
+    "summary": (80, "Step 3/3: Generating title suggestions..."),
+    "titles": (100, "Complete! ✅")
+}
+
+def iter_events(response):
+    """
+    Iterate over the stage events of an API response as they arrive.
+    
+    Args:
+        response: Streamed response from the Call Summary API
+        
+    Returns:
+        Iterator of {"stage": ..., "data": ...} events
+    """
+    if response.headers.get("content-type", "").startswith("application/x-ndjson"):
+        return (json.loads(line) for line in response.iter_lines() if line)
+    
+    # The API returned the whole result at once
+    result = response.json()
+    return iter([
+        {"stage": "transcript", "data": result["full_transcript"]},
+        {"stage": "summary", "data": result["summary"]},
+        {"stage": "titles", "data": result["suggested_titles"]}
+    ])
+
+def render_stage(stage, data, containers):
+    """
+    Render one completed stage into its results tab.
+    
+    Args:
+        stage: Name of the stage ("transcript", "summary" or "titles")
+        data: Result of the stage
+        containers: Tab containers keyed by stage
+    """
+    with containers[stage]:
+        if stage == "summary":
+            st.markdown(data)
+            
+            # Export button for summary
+            st.download_button(
+                label="Export Summary",
+                data=data,
+                file_name=f"summary_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md",
+                mime="text/markdown"
+            )
+        elif stage == "titles":
+            for i, title in enumerate(data, 1):
+                st.write(f"{i}. {title}")
+        elif stage == "transcript":
+            st.text_area("Full Transcript", data, height=400)
+            
+            # Export button for transcript
+            st.download_button(
+                label="Export Transcript",
+                data=data,
+                file_name=f"transcript_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt",
+                mime="text/plain"
+            )
+
 def main():
     st.title("🎙️ Call Summary Generator")
     st.write("Upload an audio recording to generate a detailed summary with title suggestions.")
@@ -61,81 +128,57 @@ def main():
             
             # Processing steps
             try:
-                # Save uploaded file to temp location
-                with tempfile.NamedTemporaryFile(delete=False, suffix=f".{uploaded_file.name.split('.')[-1]}") as tmp_file:
-                    tmp_file.write(uploaded_file.getvalue())
-                    temp_filename = tmp_file.name
-                
-                # Set up request
-                headers = {}
+                # Set up request, asking the API to stream each stage as it completes
+                headers = {"Accept": "application/x-ndjson"}
                 if api_key:
                     headers["X-API-Key"] = api_key
                 
-                status_text.text("Step 1/3: Transcribing audio...")
-                progress_bar.progress(20)
+                # Stream the upload straight from the uploaded file handle
+                # instead of copying it into a temp file first
+                uploaded_file.seek(0)
+                mime_type = f"audio/{uploaded_file.name.split('.')[-1]}"
                 
-                # Send request with file
-                with open(temp_filename, "rb") as file_content:
-                    files = {"audio_file": (uploaded_file.name, file_content, f"audio/{uploaded_file.name.split('.')[-1]}")}
-                    
-                    status_text.text("Step 2/3: Sending to API...")
-                    progress_bar.progress(40)
-                    
-                    # Make request to the API
-                    response = requests.post(api_url, headers=headers, files=files)
+                status_text.text("Step 1/3: Uploading and transcribing audio...")
+                progress_bar.progress(10)
                 
-                status_text.text("Step 3/3: Processing response...")
-                progress_bar.progress(80)
-                
-                # Clean up temp file
-                try:
-                    os.unlink(temp_filename)
-                except Exception as e:
-                    st.warning(f"Note: Could not remove temporary file. It will be deleted by your system later. ({str(e)})")
+                # Make request to the API
+                if has_toolbelt:
+                    encoder = MultipartEncoder(
+                        fields={"audio_file": (uploaded_file.name, uploaded_file, mime_type)}
+                    )
+                    headers["Content-Type"] = encoder.content_type
+                    response = requests.post(api_url, headers=headers, data=encoder, stream=True)
+                else:
+                    files = {"audio_file": (uploaded_file.name, uploaded_file, mime_type)}
+                    response = requests.post(api_url, headers=headers, files=files, stream=True)
                 
                 # Handle response
-                if response.status_code == 200:
-                    result = response.json()
-                    progress_bar.progress(100)
-                    status_text.text("Complete! ✅")
-                    time.sleep(1)
-                    status_text.empty()
-                    progress_bar.empty()
-                    
-                    # Display results in tabs
-                    tab1, tab2, tab3 = st.tabs(["📝 Summary", "🎯 Suggested Titles", "📄 Full Transcript"])
-                    
-                    with tab1:
-                        st.markdown(result["summary"])
+                with response:
+                    if response.status_code == 200:
+                        # Display results in tabs, filling each in as its stage arrives
+                        tabs = st.tabs(["📝 Summary", "🎯 Suggested Titles", "📄 Full Transcript"])
+                        containers = {
+                            "summary": tabs[0].container(),
+                            "titles": tabs[1].container(),
+                            "transcript": tabs[2].container()
+                        }
                         
-                        # Export button for summary
-                        summary_text = result["summary"]
-                        st.download_button(
-                            label="Export Summary",
-                            data=summary_text,
-                            file_name=f"summary_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md",
-                            mime="text/markdown"
-                        )
-                    
-                    with tab2:
-                        for i, title in enumerate(result["suggested_titles"], 1):
-                            st.write(f"{i}. {title}")
-                    
-                    with tab3:
-                        st.text_area("Full Transcript", result["full_transcript"], height=400)
+                        for event in iter_events(response):
+                            if event["stage"] == "error":
+                                raise RuntimeError(event["detail"])
+                            
+                            render_stage(event["stage"], event["data"], containers)
+                            progress, status = STAGE_PROGRESS[event["stage"]]
+                            progress_bar.progress(progress)
+                            status_text.text(status)
                         
-                        # Export button for transcript
-                        transcript_text = result["full_transcript"]
-                        st.download_button(
-                            label="Export Transcript",
-                            data=transcript_text,
-                            file_name=f"transcript_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt",
-                            mime="text/plain"
-                        )
-                else:
-                    st.error(f"Error: {response.status_code} - {response.text}")
-                    progress_bar.empty()
-                    status_text.empty()
+                        time.sleep(1)
+                        status_text.empty()
+                        progress_bar.empty()
+                    else:
+                        st.error(f"Error: {response.status_code} - {response.text}")
+                        progress_bar.empty()
+                        status_text.empty()
             
             except Exception as e:
                 st.error(f"An error occurred: {str(e)}")
@@ -1,9 +1,16 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException, Header, Depends
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Any, AsyncIterator, Callable, List, Optional, Tuple
+from contextlib import asynccontextmanager
 import uvicorn
 import os
+import importlib.util
+import hashlib
+import json
 from tempfile import NamedTemporaryFile
 import logging
 
@@ -12,9 +19,18 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Import modules
-from transcription import transcribe_audio
-from summarization import generate_summary
+from transcription import stream_transcript, get_whisper_model
+from openai_client import close_openai_client
+from summarization import summarize_cleaned_transcript, clean_transcript, collect_transcript, PrefetchedSummaries
 from title_generation import generate_titles
+from cache import (
+    cache_scope,
+    get_cached_result,
+    store_result,
+    embed_transcript,
+    find_similar_summary,
+    store_summary_embedding
+)
 
 # Get OpenAI API key from environment
 openai_api_key = os.getenv("OPENAI_API_KEY")
@@ -24,12 +40,98 @@ if openai_api_key:
 else:
     logger.warning("No OpenAI API key found. Some features may be limited.")
 
+# Size of each read when copying uploads to disk (1 MiB)
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+# Media type for streaming results stage by stage
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Largest accepted upload in bytes (500 MiB by default)
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", 500 * 1024 * 1024))
+
+class MaxUploadSizeMiddleware:
+    """
+    Reject request bodies larger than a limit with 413 Payload Too Large.
+    
+    Requests declaring a larger Content-Length are refused before the body is read; other
+    requests (e.g. chunked uploads) are cut off as soon as the received bytes pass the limit,
+    before the form parser has spooled the whole body.
+    """
+    
+    def __init__(self, app: ASGIApp, max_bytes: int) -> None:
+        self.app = app
+        self.max_bytes = max_bytes
+    
+    def too_large(self) -> HTTPException:
+        return HTTPException(
+            status_code=413,
+            detail=f"Upload exceeds the maximum size of {self.max_bytes} bytes"
+        )
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > self.max_bytes:
+            await self.reject(scope, receive, send)
+            return
+        
+        received = 0
+        response_started = False
+        
+        async def receive_limited() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    raise self.too_large()
+            return message
+        
+        async def send_tracked(message: Message) -> None:
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+        
+        # The route's exception handling normally turns the error into a 413 response;
+        # this covers bodies read outside of it
+        try:
+            await self.app(scope, receive_limited, send_tracked)
+        except HTTPException as e:
+            if e.status_code != 413 or response_started:
+                raise
+            await self.reject(scope, receive, send)
+    
+    async def reject(self, scope: Scope, receive: Receive, send: Send) -> None:
+        error = self.too_large()
+        response = JSONResponse(status_code=error.status_code, content={"detail": error.detail})
+        await response(scope, receive, send)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the local Whisper model before the first request so it is resident in each worker
+    try:
+        await run_in_threadpool(get_whisper_model, "base")
+        logger.info("Local Whisper model loaded")
+    except Exception as e:
+        logger.warning(f"Failed to preload local Whisper model: {str(e)}")
+    yield
+    await close_openai_client()
+
 app = FastAPI(
     title="Call Summary API",
     description="API for generating summaries from audio recordings with speaker diarization",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# Cap upload sizes while the body is being received. Registered before CORS so the CORS
+# middleware wraps it and early 413 responses still carry the CORS headers browsers need
+app.add_middleware(MaxUploadSizeMiddleware, max_bytes=MAX_UPLOAD_BYTES)
+
 # Add CORS middleware to allow cross-origin requests
 app.add_middleware(
     CORSMiddleware,
@@ -44,10 +146,158 @@ class SummaryResponse(BaseModel):
     suggested_titles: List[str]
     full_transcript: str
 
+async def summarize_with_cache(
+    transcript: str,
+    prefetched: Optional[PrefetchedSummaries] = None,
+    api_key: Optional[str] = None,
+    on_fallback: Optional[Callable[[Exception], None]] = None
+) -> str:
+    """
+    Generate a summary, reusing the summary of a near-identical transcript when one is cached.
+    
+    Only summaries cached under the same API key are reused, and summaries produced by
+    the fallback after an OpenAI failure are not cached.
+    
+    Args:
+        transcript: The transcript with speaker identification
+        prefetched: Chunk summaries started during transcription, if any
+        api_key: OpenAI API key for this request
+        on_fallback: Called with the error when OpenAI summarization fails and a fallback is used
+        
+    Returns:
+        The summary text
+    """
+    cleaned = clean_transcript(transcript)
+    scope = cache_scope(api_key)
+    
+    embedding = None
+    if api_key:
+        try:
+            embedding = await embed_transcript(cleaned, api_key)
+            summary = await run_in_threadpool(find_similar_summary, embedding, scope, len(cleaned))
+            if summary:
+                logger.info("Reusing summary of a similar transcript")
+                if prefetched:
+                    prefetched.cancel()
+                return summary
+        except Exception as e:
+            logger.warning(f"Semantic cache lookup failed: {str(e)}")
+    
+    failures: List[Exception] = []
+    summary = await summarize_cleaned_transcript(cleaned, prefetched, api_key, failures.append)
+    if on_fallback:
+        for error in failures:
+            on_fallback(error)
+    
+    if embedding is not None and not failures:
+        try:
+            await run_in_threadpool(store_summary_embedding, embedding, scope, summary, len(cleaned))
+        except Exception as e:
+            logger.warning(f"Failed to cache summary embedding: {str(e)}")
+    
+    return summary
+
+async def process_audio(
+    temp_file_path: str,
+    audio_hash: str,
+    api_key: Optional[str] = None
+) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Run the transcription pipeline, yielding each result as soon as it is ready.
+    
+    The temporary audio file is deleted once the pipeline finishes or is closed. Results
+    are only cached when every stage succeeded on its primary path, so a transient OpenAI
+    failure does not pin a degraded fallback result in the cache.
+    
+    Args:
+        temp_file_path: Path to the uploaded audio file
+        audio_hash: SHA-256 hex digest of the audio file
+        api_key: OpenAI API key for this request
+        
+    Yields:
+        (stage, data) pairs for the "transcript", "summary" and "titles" stages, in order
+    """
+    prefetched = None
+    failures: List[Exception] = []
+    try:
+        # Return the stored result if this exact recording was processed before
+        try:
+            cached = await run_in_threadpool(get_cached_result, audio_hash, cache_scope(api_key))
+        except Exception as e:
+            logger.warning(f"Result cache lookup failed: {str(e)}")
+            cached = None
+        if cached:
+            logger.info("Returning cached result")
+            yield "transcript", cached["full_transcript"]
+            yield "summary", cached["summary"]
+            yield "titles", cached["suggested_titles"]
+            return
+        
+        # Step 1: Transcribe audio with speaker diarization, summarizing finished chunks
+        # of long transcripts while the rest is still being transcribed
+        logger.info("Starting transcription")
+        transcript, prefetched = await collect_transcript(
+            stream_transcript(temp_file_path, api_key, failures.append), api_key
+        )
+        logger.info("Transcription completed")
+        yield "transcript", transcript
+        
+        # Step 2: Generate summary from transcript
+        logger.info("Generating summary")
+        summary = await summarize_with_cache(transcript, prefetched, api_key, failures.append)
+        logger.info("Summary generation completed")
+        yield "summary", summary
+        
+        # Step 3: Generate title suggestions
+        logger.info("Generating title suggestions")
+        titles = await generate_titles(summary, api_key, failures.append)
+        logger.info("Title generation completed")
+        yield "titles", titles
+        
+        if failures:
+            logger.info("Not caching result produced by a fallback after an OpenAI failure")
+            return
+        
+        try:
+            await run_in_threadpool(store_result, audio_hash, cache_scope(api_key), transcript, summary, titles)
+        except Exception as e:
+            logger.warning(f"Failed to cache result: {str(e)}")
+    finally:
+        # Stop chunk summaries still running if the client went away mid-pipeline
+        if prefetched:
+            prefetched.cancel()
+        
+        # Clean up the temporary file
+        try:
+            os.unlink(temp_file_path)
+            logger.info("Temporary file deleted")
+        except Exception as e:
+            logger.warning(f"Failed to delete temporary file: {str(e)}")
+
+async def stream_events(events: AsyncIterator[Tuple[str, Any]]) -> AsyncIterator[str]:
+    """
+    Serialize pipeline results as newline-delimited JSON events.
+    
+    Args:
+        events: (stage, data) pairs from process_audio
+        
+    Yields:
+        One JSON line per stage, or a final "error" event if processing fails
+    """
+    try:
+        async for stage, data in events:
+            yield json.dumps({"stage": stage, "data": data}) + "\n"
+    except Exception as e:
+        logger.error(f"Error during processing: {str(e)}")
+        yield json.dumps({"stage": "error", "detail": f"Error processing audio: {str(e)}"}) + "\n"
+    finally:
+        await events.aclose()
+
 @app.post("/api/generate-summary/", response_model=SummaryResponse)
 async def generate_call_summary(
     audio_file: UploadFile = File(...),
-    x_api_key: Optional[str] = Header(None)
+    x_api_key: Optional[str] = Header(None),
+    accept: Optional[str] = Header(None)
 ):
     """
     Generate a summary from an audio recording with speaker diarization.
@@ -55,68 +305,72 @@ async def generate_call_summary(
     Args:
         audio_file: The audio file to transcribe and summarize
         x_api_key: Optional API key in header
+        accept: Send "application/x-ndjson" to receive each stage as soon as it completes
         
     Returns:
         A JSON object containing:
         - summary: A concise summary of the key points
         - suggested_titles: 3 potential titles for the call
         - full_transcript: The complete transcript with speaker identification
+        
+        Or, when streaming, newline-delimited JSON events of the form
+        {"stage": "transcript" | "summary" | "titles", "data": ...}, followed by
+        {"stage": "error", "detail": ...} if processing fails part way.
     """
-    # Set API key from header if provided
+    # Use the API key from the header if provided; it is passed down explicitly rather than
+    # stored in the environment, where it would leak into concurrently running requests
+    api_key = x_api_key or os.getenv("OPENAI_API_KEY")
     if x_api_key:
-        os.environ["OPENAI_API_KEY"] = x_api_key
         logger.info("Using API key from request header")
     
     try:
         # Save the uploaded file temporarily
         with NamedTemporaryFile(delete=False, suffix=os.path.splitext(audio_file.filename)[-1]) as temp_file:
             temp_file_path = temp_file.name
-            content = await audio_file.read()
-            temp_file.write(content)
-        
-        logger.info(f"Processing audio file: {audio_file.filename}")
-        
-        # Process the audio file
-        try:
-            # Step 1: Transcribe audio with speaker diarization
-            logger.info("Starting transcription")
-            transcript = transcribe_audio(temp_file_path)
-            logger.info("Transcription completed")
-            
-            # Step 2: Generate summary from transcript
-            logger.info("Generating summary")
-            summary = generate_summary(transcript)
-            logger.info("Summary generation completed")
-            
-            # Step 3: Generate title suggestions
-            logger.info("Generating title suggestions")
-            titles = generate_titles(summary)
-            logger.info("Title generation completed")
-            
-            # Return the results
-            return SummaryResponse(
-                summary=summary,
-                suggested_titles=titles,
-                full_transcript=transcript
-            )
-        except Exception as e:
-            logger.error(f"Error during processing: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"Error processing audio: {str(e)}")
-        finally:
-            # Clean up the temporary file
-            try:
-                os.unlink(temp_file_path)
-                logger.info("Temporary file deleted")
-            except Exception as e:
-                logger.warning(f"Failed to delete temporary file: {str(e)}")
-            
+            # Copy the upload in fixed-size chunks so memory stays bounded for large recordings,
+            # hashing it on the way for the result cache
+            hasher = hashlib.sha256()
+            while chunk := await audio_file.read(UPLOAD_CHUNK_SIZE):
+                hasher.update(chunk)
+                temp_file.write(chunk)
+        audio_hash = hasher.hexdigest()
     except Exception as e:
         logger.error(f"Error handling file upload: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error processing audio: {str(e)}")
+    
+    logger.info(f"Processing audio file: {audio_file.filename}")
+    events = process_audio(temp_file_path, audio_hash, api_key)
+    
+    # Stream each stage to clients that ask for it
+    if accept and NDJSON_MEDIA_TYPE in accept:
+        return StreamingResponse(stream_events(events), media_type=NDJSON_MEDIA_TYPE)
+    
+    # Otherwise process the audio file and return everything at once
+    try:
+        results = {stage: data async for stage, data in events}
+    except Exception as e:
+        logger.error(f"Error during processing: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error processing audio: {str(e)}")
+    
+    # Return the results
+    return SummaryResponse(
+        summary=results["summary"],
+        suggested_titles=results["titles"],
+        full_transcript=results["transcript"]
+    )
 
 @app.get("/")
 async def root():
     return {"message": "Welcome to the Call Summary API. Use /api/generate-summary/ to process audio files."}
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    # One worker process per core (plus headroom), each running its own event loop
+    workers = int(os.getenv("WEB_CONCURRENCY", 2 * (os.cpu_count() or 1) + 1))
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        workers=workers,
+        loop="uvloop" if importlib.util.find_spec("uvloop") else "asyncio",
+        http="httptools" if importlib.util.find_spec("httptools") else "h11"
+    )
\ No newline at end of file
@@ -0,0 +1,64 @@
+import os
+import httpx
+import openai
+from functools import lru_cache
+from typing import Optional
+
+# Connection pool shared by every OpenAI request in the process
+MAX_CONNECTIONS = 100
+MAX_KEEPALIVE_CONNECTIONS = 20
+REQUEST_TIMEOUT = 60
+
+@lru_cache(maxsize=1)
+def _get_http_client() -> httpx.AsyncClient:
+    """
+    Create the pooled HTTP/2 client used for all OpenAI requests.
+    
+    Returns:
+        Shared httpx async client
+    """
+    return httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS
+        ),
+        timeout=REQUEST_TIMEOUT
+    )
+
+@lru_cache(maxsize=16)
+def _get_client_for_key(api_key: str) -> openai.AsyncOpenAI:
+    """
+    Create an OpenAI client for an API key on top of the shared connection pool.
+    
+    Args:
+        api_key: OpenAI API key
+        
+    Returns:
+        Async OpenAI client
+    """
+    return openai.AsyncOpenAI(api_key=api_key, http_client=_get_http_client())
+
+def get_openai_client(api_key: Optional[str] = None) -> openai.AsyncOpenAI:
+    """
+    Get the async OpenAI client for an API key.
+    
+    Clients are reused and share one keep-alive connection pool, so the TCP and TLS
+    handshakes are paid once rather than on every request.
+    
+    Args:
+        api_key: OpenAI API key; defaults to the OPENAI_API_KEY environment variable
+        
+    Returns:
+        Async OpenAI client
+    """
+    return _get_client_for_key(api_key or os.getenv("OPENAI_API_KEY"))
+
+async def close_openai_client() -> None:
+    """
+    Close the shared connection pool and forget the cached clients.
+    """
+    if _get_http_client.cache_info().currsize:
+        await _get_http_client().aclose()
+    _get_client_for_key.cache_clear()
+    _get_http_client.cache_clear()
\ No newline at end of file
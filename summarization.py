@@ -1,21 +1,109 @@
 import os
 import re
-import openai
-from typing import Dict, List, Any
+import asyncio
+import threading
+import numpy as np
+from functools import lru_cache
+from typing import Dict, List, Any, AsyncIterator, Callable, NamedTuple, Optional, Tuple
+from openai_client import get_openai_client
 
 # Try to import transformers, but provide fallback if not available
 try:
+    import torch
     from transformers import pipeline
     has_transformers = True
 except ImportError:
     has_transformers = False
 
-def generate_summary(transcript: str) -> str:
+# Precompiled patterns for transcript processing
+BRACKET_RE = re.compile(r'\[.*?\]')  # Non-textual markers such as [noise]
+SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?])\s+')
+SPEAKER_RE = re.compile(r'(Speaker [^:]+):')
+
+# System prompt shared by every summarization call. It is kept identical and first in
+# the messages so OpenAI's prompt caching can reuse it across chunk requests.
+SYSTEM_PROMPT = (
+    "You are a professional meeting summarizer. "
+    "Summarize the provided meeting transcript into a concise, structured summary "
+    "that captures the key points of the discussion. "
+    "Include a 'Key Points' section that extracts the most important takeaways."
+)
+
+# Largest transcript slice sent in one request. Sized for ~2 characters per token, which
+# holds for non-English and number-heavy transcripts too (English prose is ~4), so a chunk
+# stays under ~14k tokens and fits gpt-3.5-turbo's 16k context with the prompt and response
+MAX_CHUNK_SIZE = 28000
+
+# Partial summaries shorter than this (in characters) are joined instead of combined by another call
+COMBINE_THRESHOLD = 3000
+
+# Maximum number of concurrent OpenAI requests when summarizing chunks
+MAX_CONCURRENT_REQUESTS = 8
+
+# Number of chunks the local summarization pipeline processes per forward pass
+TRANSFORMERS_BATCH_SIZE = 8
+
+# Serializes loading and use of the shared pipeline; its fast tokenizer is not thread-safe
+_summarizer_lock = threading.RLock()
+
+class PrefetchedSummaries(NamedTuple):
+    """Chunk summaries started while the transcript was still being produced."""
+    tasks: List["asyncio.Task[str]"]
+    remainder: str  # Cleaned tail of the transcript not covered by the tasks
+    semaphore: asyncio.Semaphore  # Bounds the request's concurrent OpenAI calls
+    
+    def cancel(self) -> None:
+        """Cancel the pending tasks and discard the results of finished ones."""
+        cancel_tasks(self.tasks)
+
+def cancel_tasks(tasks: List["asyncio.Future"]) -> None:
+    """
+    Cancel the pending tasks and discard the results of finished ones.
+    
+    Args:
+        tasks: Tasks to stop
+    """
+    for task in tasks:
+        if task.done():
+            if not task.cancelled():
+                task.exception()  # Mark any failure as retrieved
+        else:
+            task.cancel()
+
+async def gather_or_cancel(*aws: Any) -> List[Any]:
+    """
+    Run awaitables concurrently like asyncio.gather, cancelling the rest if one fails.
+    
+    Plain asyncio.gather leaves the other chunk requests running (and billed) after the
+    first failure, even though the caller has already moved on to a fallback.
+    
+    Args:
+        aws: Coroutines or tasks to run
+        
+    Returns:
+        Their results, in order
+    """
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        cancel_tasks(tasks)
+        raise
+
+async def generate_summary(
+    transcript: str,
+    prefetched: Optional[PrefetchedSummaries] = None,
+    api_key: Optional[str] = None,
+    on_fallback: Optional[Callable[[Exception], None]] = None
+) -> str:
     """
     Generate a concise summary of the meeting transcript.
     
     Args:
         transcript: The transcribed meeting with speaker identification
+        prefetched: Chunk summaries already started by collect_transcript, if any
+        api_key: OpenAI API key; defaults to the OPENAI_API_KEY environment variable
+        on_fallback: Called with the error when the OpenAI call fails and a fallback is used
         
     Returns:
         A structured summary with key points
@@ -23,18 +111,97 @@ def generate_summary(transcript: str) -> str:
     # Clean the transcript
     cleaned_transcript = clean_transcript(transcript)
     
+    return await summarize_cleaned_transcript(cleaned_transcript, prefetched, api_key, on_fallback)
+
+async def summarize_cleaned_transcript(
+    cleaned_transcript: str,
+    prefetched: Optional[PrefetchedSummaries] = None,
+    api_key: Optional[str] = None,
+    on_fallback: Optional[Callable[[Exception], None]] = None
+) -> str:
+    """
+    Generate the summary of a transcript that has already been through clean_transcript.
+    
+    Callers that need the cleaned text themselves use this to clean it only once.
+    
+    Args:
+        cleaned_transcript: The cleaned transcript
+        prefetched: Chunk summaries already started by collect_transcript, if any
+        api_key: OpenAI API key; defaults to the OPENAI_API_KEY environment variable
+        on_fallback: Called with the error when the OpenAI call fails and a fallback is used
+        
+    Returns:
+        A structured summary with key points
+    """
     # Try to use OpenAI for summarization if API key is available
-    if os.getenv("OPENAI_API_KEY"):
+    api_key = api_key or os.getenv("OPENAI_API_KEY")
+    if api_key:
         try:
-            return summarize_with_openai(cleaned_transcript)
+            return await summarize_with_openai(cleaned_transcript, prefetched, api_key)
         except Exception as e:
             print(f"OpenAI summarization failed: {str(e)}. Falling back to local model.")
+            if on_fallback:
+                on_fallback(e)
     
-    # Fallback to local model or rule-based approach
+    if prefetched:
+        prefetched.cancel()
+    
+    # Fallback to local model or rule-based approach (run off the event loop)
     if has_transformers:
-        return summarize_with_transformers(cleaned_transcript)
+        return await asyncio.to_thread(summarize_with_transformers, cleaned_transcript)
     else:
-        return simple_extractive_summary(cleaned_transcript)
+        return await asyncio.to_thread(simple_extractive_summary, cleaned_transcript)
+
+async def collect_transcript(
+    pieces: AsyncIterator[str],
+    api_key: Optional[str] = None
+) -> Tuple[str, PrefetchedSummaries]:
+    """
+    Assemble a transcript from streamed pieces, summarizing completed chunks on the way.
+    
+    When OpenAI is available and the transcript arrives in several pieces (local Whisper),
+    every MAX_CHUNK_SIZE characters are sent for summarization once the next piece shows
+    transcription is still running, so the map step overlaps transcription. A transcript
+    delivered in one piece is left entirely to generate_summary.
+    
+    Args:
+        pieces: Transcript text in order, as produced by transcription.stream_transcript
+        api_key: OpenAI API key; defaults to the OPENAI_API_KEY environment variable
+        
+    Returns:
+        The full transcript and the chunk summaries started for it
+    """
+    api_key = api_key or os.getenv("OPENAI_API_KEY")
+    speculate = bool(api_key)
+    parts: List[str] = []
+    pending: List[str] = []
+    pending_length = 0
+    tasks: List["asyncio.Task[str]"] = []
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    
+    try:
+        async for piece in pieces:
+            parts.append(piece)
+            if not speculate:
+                continue
+            
+            # Start summaries for every full chunk and keep the tail for later
+            if pending_length > MAX_CHUNK_SIZE:
+                cleaned = clean_transcript("".join(pending))
+                chunks = chunk_text(cleaned, max_length=MAX_CHUNK_SIZE) if len(cleaned) > MAX_CHUNK_SIZE else [cleaned]
+                for chunk in chunks[:-1]:
+                    tasks.append(asyncio.create_task(summarize_chunk_bounded(chunk, semaphore, api_key)))
+                pending = [chunks[-1]]
+                pending_length = len(chunks[-1])
+            
+            pending.append(piece)
+            pending_length += len(piece)
+    except BaseException:
+        cancel_tasks(tasks)
+        raise
+    
+    transcript = "".join(parts).strip()
+    return transcript, PrefetchedSummaries(tasks, clean_transcript("".join(pending)), semaphore)
 
 def clean_transcript(transcript: str) -> str:
     """
@@ -46,73 +213,161 @@ def clean_transcript(transcript: str) -> str:
     Returns:
         Cleaned transcript
     """
-    # Remove excessive whitespace
-    cleaned = re.sub(r'\s+', ' ', transcript)
+    # Remove excessive whitespace (str.split matches the same whitespace as \s, without the regex engine)
+    cleaned = ' '.join(transcript.split())
     
     # Remove any non-textual markers
-    cleaned = re.sub(r'\[.*?\]', '', cleaned)
+    cleaned = BRACKET_RE.sub('', cleaned)
     
     return cleaned.strip()
 
-def summarize_with_openai(transcript: str) -> str:
+async def summarize_chunk(chunk: str, api_key: Optional[str] = None) -> str:
     """
-    Generate summary using OpenAI's API.
+    Summarize one chunk of a long transcript (the map step).
     
     Args:
-        transcript: The cleaned transcript
+        chunk: Part of the cleaned transcript
+        api_key: OpenAI API key
         
     Returns:
-        Formatted summary
+        Partial summary
     """
-    system_prompt = (
-        "You are a professional meeting summarizer. "
-        "Summarize the provided meeting transcript into a concise, structured summary "
-        "that captures the key points of the discussion. "
-        "Include a 'Key Points' section that extracts the most important takeaways."
+    client = get_openai_client(api_key)
+    response = await client.chat.completions.create(
+        model="gpt-3.5-turbo",
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": f"Summarize this part of the transcript: {chunk}"}
+        ],
+        max_tokens=500
     )
+    return response.choices[0].message.content
+
+async def summarize_chunk_bounded(
+    chunk: str,
+    semaphore: asyncio.Semaphore,
+    api_key: Optional[str] = None
+) -> str:
+    """
+    Summarize one chunk while holding a slot of the transcript's request limit.
     
-    # Split transcript if it's too large for context window
-    max_chunk_size = 10000  # Adjust based on model being used
-    if len(transcript) > max_chunk_size:
-        chunks = [transcript[i:i+max_chunk_size] for i in range(0, len(transcript), max_chunk_size)]
+    Args:
+        chunk: Part of the cleaned transcript
+        semaphore: Limit on concurrent requests shared by the chunks of one transcript
+        api_key: OpenAI API key
         
-        # Summarize each chunk
-        chunk_summaries = []
-        for chunk in chunks:
-            response = openai.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": f"Summarize this part of the transcript: {chunk}"}
-                ],
-                max_tokens=500
-            )
-            chunk_summaries.append(response.choices[0].message.content)
+    Returns:
+        Partial summary
+    """
+    async with semaphore:
+        return await summarize_chunk(chunk, api_key)
+
+async def combine_chunk_summaries(chunk_summaries: List[str], api_key: Optional[str] = None) -> str:
+    """
+    Merge partial summaries into the final summary (the reduce step).
+    
+    Args:
+        chunk_summaries: Partial summaries in transcript order
+        api_key: OpenAI API key
         
-        # Combine chunk summaries for final summary
-        combined = " ".join(chunk_summaries)
+    Returns:
+        Formatted summary
+    """
+    # Skip the extra combine round-trip when the partial summaries are already short
+    if len(chunk_summaries) == 1:
+        return chunk_summaries[0]
+    
+    joined = "\n\n".join(chunk_summaries)
+    if len(joined) <= COMBINE_THRESHOLD:
+        return joined
+    
+    # Combine chunk summaries for final summary
+    combined = " ".join(chunk_summaries)
+    
+    client = get_openai_client(api_key)
+    response = await client.chat.completions.create(
+        model="gpt-3.5-turbo",
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": f"Create a final summary combining these partial summaries: {combined}"}
+        ],
+        max_tokens=800
+    )
+    return response.choices[0].message.content
+
+async def summarize_with_openai(
+    transcript: str,
+    prefetched: Optional[PrefetchedSummaries] = None,
+    api_key: Optional[str] = None
+) -> str:
+    """
+    Generate summary using OpenAI's API.
+    
+    Args:
+        transcript: The cleaned transcript
+        prefetched: Chunk summaries already started for the start of the transcript, if any
+        api_key: OpenAI API key
         
-        response = openai.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Create a final summary combining these partial summaries: {combined}"}
-            ],
-            max_tokens=800
+    Returns:
+        Formatted summary
+    """
+    # Finish the speculative map step by summarizing the untranscribed-at-the-time tail
+    if prefetched and prefetched.tasks:
+        tail_chunks = chunk_text(prefetched.remainder, max_length=MAX_CHUNK_SIZE)
+        chunk_summaries = await gather_or_cancel(
+            *prefetched.tasks,
+            *[summarize_chunk_bounded(chunk, prefetched.semaphore, api_key) for chunk in tail_chunks]
         )
-    else:
-        # Summarize the entire transcript at once
-        response = openai.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Summarize this meeting transcript: {transcript}"}
-            ],
-            max_tokens=800
+        return await combine_chunk_summaries(chunk_summaries, api_key)
+    
+    # Split transcript on word boundaries if it's too large for context window
+    if len(transcript) > MAX_CHUNK_SIZE:
+        chunks = chunk_text(transcript, max_length=MAX_CHUNK_SIZE)
+        
+        # Summarize the chunks concurrently, bounded to respect rate limits
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        chunk_summaries = await gather_or_cancel(
+            *[summarize_chunk_bounded(chunk, semaphore, api_key) for chunk in chunks]
         )
+        return await combine_chunk_summaries(chunk_summaries, api_key)
+    
+    # Summarize the entire transcript at once
+    client = get_openai_client(api_key)
+    response = await client.chat.completions.create(
+        model="gpt-3.5-turbo",
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": f"Summarize this meeting transcript: {transcript}"}
+        ],
+        max_tokens=800
+    )
     
     return response.choices[0].message.content
 
+def get_summarizer():
+    """
+    Load the local summarization pipeline once per process and reuse it.
+    
+    Uses fp16 on a CUDA GPU when one is available, otherwise fp32 on CPU. Callers
+    running inference must hold _summarizer_lock while using the pipeline.
+    
+    Returns:
+        Hugging Face summarization pipeline
+    """
+    # lru_cache does not stop concurrent first calls from each loading the model
+    with _summarizer_lock:
+        return _load_summarizer()
+
+@lru_cache(maxsize=1)
+def _load_summarizer():
+    use_gpu = torch.cuda.is_available()
+    return pipeline(
+        "summarization", 
+        model="facebook/bart-large-cnn",
+        device=0 if use_gpu else -1,
+        model_kwargs={"torch_dtype": torch.float16 if use_gpu else torch.float32}
+    )
+
 def summarize_with_transformers(transcript: str) -> str:
     """
     Generate summary using Hugging Face transformers.
@@ -123,23 +378,28 @@ def summarize_with_transformers(transcript: str) -> str:
     Returns:
         Structured summary
     """
-    # Initialize the pipeline
-    summarizer = pipeline(
-        "summarization", 
-        model="facebook/bart-large-cnn",
-        device=-1  # Use CPU
-    )
-    
     # Handle long transcripts by chunking
     chunks = chunk_text(transcript, max_length=1000)
     chunk_summaries = []
     
-    for chunk in chunks:
+    # Requests summarizing at the same time take turns on the shared pipeline
+    with _summarizer_lock:
+        summarizer = get_summarizer()
+        
+        # Summarize all chunks in batches; retry one by one so a bad chunk only drops itself
         try:
-            summary = summarizer(chunk, max_length=150, min_length=50, do_sample=False)
-            chunk_summaries.append(summary[0]['summary_text'])
+            summaries = summarizer(
+                chunks, batch_size=TRANSFORMERS_BATCH_SIZE, max_length=150, min_length=50, do_sample=False
+            )
+            chunk_summaries = [summary['summary_text'] for summary in summaries]
         except Exception as e:
-            print(f"Error summarizing chunk: {str(e)}")
+            print(f"Batched summarization failed: {str(e)}. Summarizing chunks individually.")
+            for chunk in chunks:
+                try:
+                    summary = summarizer(chunk, max_length=150, min_length=50, do_sample=False)
+                    chunk_summaries.append(summary[0]['summary_text'])
+                except Exception as e:
+                    print(f"Error summarizing chunk: {str(e)}")
     
     # Combine chunk summaries
     combined_summary = " ".join(chunk_summaries)
@@ -150,7 +410,7 @@ def summarize_with_transformers(transcript: str) -> str:
     structured_summary += "## Key Points\n\n"
     
     # Extract key points based on important sentences
-    sentences = re.split(r'(?<=[.!?])\s+', combined_summary)
+    sentences = SENTENCE_SPLIT_RE.split(combined_summary)
     for i, sentence in enumerate(sentences[:5]):  # Limit to top 5 key points
         if len(sentence) > 10:  # Skip very short sentences
             structured_summary += f"- {sentence}\n"
@@ -168,11 +428,10 @@ def simple_extractive_summary(transcript: str) -> str:
         Simple summary
     """
     # Split into sentences
-    sentences = re.split(r'(?<=[.!?])\s+', transcript)
+    sentences = SENTENCE_SPLIT_RE.split(transcript)
     
     # Extract speaker turns
-    speaker_pattern = r'(Speaker [^:]+):'
-    speaker_turns = re.findall(speaker_pattern, transcript)
+    speaker_turns = SPEAKER_RE.findall(transcript)
     
     # Count unique speakers
     unique_speakers = set(speaker_turns)
@@ -206,6 +465,9 @@ def chunk_text(text: str, max_length: int = 1000) -> list:
     """
     Split text into chunks of specified maximum length.
     
+    Words are packed greedily so that each chunk, joined with single spaces, is at most
+    max_length characters; a single longer word forms a chunk of its own.
+    
     Args:
         text: Input text
         max_length: Maximum chunk length
@@ -214,20 +476,21 @@ def chunk_text(text: str, max_length: int = 1000) -> list:
         List of text chunks
     """
     words = text.split()
-    chunks = []
-    current_chunk = []
-    current_length = 0
-    
-    for word in words:
-        if current_length + len(word) + 1 > max_length:
-            chunks.append(' '.join(current_chunk))
-            current_chunk = [word]
-            current_length = len(word)
-        else:
-            current_chunk.append(word)
-            current_length += len(word) + 1
+    if not words:
+        return []
+    
+    # cum[i] is the length of words[:i+1] joined with single spaces, plus one
+    lengths = np.fromiter((len(word) for word in words), dtype=np.int64, count=len(words))
+    cum = np.cumsum(lengths + 1)
     
-    if current_chunk:
-        chunks.append(' '.join(current_chunk))
+    # Greedily take as many words as fit, finding each boundary with a binary search
+    chunks = []
+    start = 0
+    while start < len(words):
+        offset = cum[start - 1] if start else 0
+        end = int(np.searchsorted(cum, offset + max_length + 1, side='right'))
+        end = max(end, start + 1)  # A single over-long word still forms its own chunk
+        chunks.append(' '.join(words[start:end]))
+        start = end
     
     return chunks
\ No newline at end of file
@@ -1,35 +1,69 @@
 import os
 import re
-import openai
 import random
-from typing import List
+from collections import Counter
+from functools import lru_cache
+from typing import Callable, List, Optional, Tuple
+from openai_client import get_openai_client
 
-def generate_titles(summary: str) -> List[str]:
+# Precompiled patterns for cleaning titles and summaries
+LIST_MARKER_RE = re.compile(r'^[\d\.\-\*\•\○\□\s]+')
+HEADING_RE = re.compile(r'#+\s+')
+NEWLINES_RE = re.compile(r'\n+')
+
+# Templates for rule-based titles
+TITLE_TEMPLATES = (
+    "{topic1} Discussion Summary",
+    "{topic1} and {topic2} Planning",
+    "Meeting Notes: {topic1} Review",
+    "{topic1} Strategy Session",
+    "Quarterly {topic1} Update",
+    "{topic1}: Analysis & Next Steps",
+    "{topic1} Implementation Plan",
+    "{topic1} and {topic2} Collaboration"
+)
+
+# Words ignored when extracting key topics
+STOP_WORDS = frozenset(['the', 'and', 'a', 'an', 'in', 'on', 'at', 'to', 'for', 'with', 
+                        'by', 'of', 'is', 'was', 'were', 'be', 'as', 'that', 'this',
+                        'key', 'point', 'points', 'meeting', 'summary'])
+
+async def generate_titles(
+    summary: str,
+    api_key: Optional[str] = None,
+    on_fallback: Optional[Callable[[Exception], None]] = None
+) -> List[str]:
     """
     Generate three title suggestions based on the meeting summary.
     
     Args:
         summary: The meeting summary text
+        api_key: OpenAI API key; defaults to the OPENAI_API_KEY environment variable
+        on_fallback: Called with the error when the OpenAI call fails and a fallback is used
         
     Returns:
         List of 3 suggested titles
     """
     # Try to use OpenAI for title generation if API key is available
-    if os.getenv("OPENAI_API_KEY"):
+    api_key = api_key or os.getenv("OPENAI_API_KEY")
+    if api_key:
         try:
-            return generate_titles_with_openai(summary)
+            return await generate_titles_with_openai(summary, api_key)
         except Exception as e:
             print(f"OpenAI title generation failed: {str(e)}. Falling back to rule-based approach.")
+            if on_fallback:
+                on_fallback(e)
     
     # Use rule-based approach as fallback
     return generate_titles_rule_based(summary)
 
-def generate_titles_with_openai(summary: str) -> List[str]:
+async def generate_titles_with_openai(summary: str, api_key: Optional[str] = None) -> List[str]:
     """
     Generate titles using OpenAI's API.
     
     Args:
         summary: Meeting summary
+        api_key: OpenAI API key
         
     Returns:
         List of 3 suggested titles
@@ -44,7 +78,8 @@ def generate_titles_with_openai(summary: str) -> List[str]:
         "Titles:"
     )
     
-    response = openai.chat.completions.create(
+    client = get_openai_client(api_key)
+    response = await client.chat.completions.create(
         model="gpt-3.5-turbo",
         messages=[
             {"role": "system", "content": "You are a professional title generator for business meetings."},
@@ -62,7 +97,7 @@ def generate_titles_with_openai(summary: str) -> List[str]:
     
     for line in lines:
         # Remove numbering, bullets and leading/trailing whitespace
-        clean_line = re.sub(r'^[\d\.\-\*\•\○\□\s]+', '', line).strip()
+        clean_line = LIST_MARKER_RE.sub('', line).strip()
         
         # Add non-empty lines that aren't too long
         if clean_line and len(clean_line) < 60:
@@ -91,30 +126,12 @@ def generate_titles_rule_based(summary: str) -> List[str]:
     if len(topics) < 2:
         topics = topics + ["Discussion", "Planning", "Review"]
     
-    # Generate titles from templates
-    templates = [
-        "{topic1} Discussion Summary",
-        "{topic1} and {topic2} Planning",
-        "Meeting Notes: {topic1} Review",
-        "{topic1} Strategy Session",
-        "Quarterly {topic1} Update",
-        "{topic1}: Analysis & Next Steps",
-        "{topic1} Implementation Plan",
-        "{topic1} and {topic2} Collaboration"
+    # Generate titles from randomly chosen templates
+    topic1, topic2 = topics[0].capitalize(), topics[1].capitalize()
+    return [
+        template.format(topic1=topic1, topic2=topic2)
+        for template in random.sample(TITLE_TEMPLATES, 3)
     ]
-    
-    titles = []
-    random.shuffle(templates)
-    
-    for template in templates[:3]:
-        if "{topic1}" in template and "{topic2}" in template:
-            title = template.format(topic1=topics[0].capitalize(), topic2=topics[1].capitalize())
-        else:
-            title = template.format(topic1=topics[0].capitalize())
-        
-        titles.append(title)
-    
-    return titles
 
 def extract_key_topics(summary: str) -> List[str]:
     """
@@ -126,31 +143,31 @@ def extract_key_topics(summary: str) -> List[str]:
     Returns:
         List of key topics
     """
+    return list(_extract_key_topics(summary))
+
+@lru_cache(maxsize=128)
+def _extract_key_topics(summary: str) -> Tuple[str, ...]:
+    """
+    Extract key topics from the summary text, memoized per summary.
+    
+    Args:
+        summary: Meeting summary
+        
+    Returns:
+        Tuple of key topics
+    """
     # Remove markdown formatting
-    text = re.sub(r'#+\s+', '', summary)
-    text = re.sub(r'\n+', ' ', text)
+    text = HEADING_RE.sub('', summary)
+    text = NEWLINES_RE.sub(' ', text)
     
-    # Get the most frequent words (simplified)
+    # Get the most frequent words (simplified), filtering out stop words and short words
     words = text.lower().split()
-    stop_words = set(['the', 'and', 'a', 'an', 'in', 'on', 'at', 'to', 'for', 'with', 
-                     'by', 'of', 'is', 'was', 'were', 'be', 'as', 'that', 'this',
-                     'key', 'point', 'points', 'meeting', 'summary'])
-    
-    # Filter out stop words and short words
-    filtered_words = [word for word in words if word not in stop_words and len(word) > 3]
-    
-    # Count word frequencies
-    word_counts = {}
-    for word in filtered_words:
-        if word not in word_counts:
-            word_counts[word] = 0
-        word_counts[word] += 1
+    word_counts = Counter(word for word in words if len(word) > 3 and word not in STOP_WORDS)
     
     # Get top topics
-    sorted_words = sorted(word_counts.items(), key=lambda x: x[1], reverse=True)
-    topics = [word for word, _ in sorted_words[:5]]
+    topics = [word for word, _ in word_counts.most_common(5)]
     
     if not topics:
         topics = ["Business", "Meeting", "Discussion"]
     
-    return topics
\ No newline at end of file
+    return tuple(topics)
\ No newline at end of file
@@ -1,50 +1,70 @@
 import os
-import openai
-import whisper
+import asyncio
+import threading
+import ctranslate2
+from faster_whisper import WhisperModel
 import json
 import tempfile
-from typing import Dict, List, Any
+from functools import lru_cache
+from typing import Dict, List, Any, AsyncIterator, Callable, Iterator, Optional
+from openai_client import get_openai_client
 
-# Set OpenAI API key from environment variable
-openai.api_key = os.getenv("OPENAI_API_KEY")
+# Uploading and transcribing a long call takes far longer than a chat completion,
+# so transcription gets its own timeout instead of the client's default
+TRANSCRIPTION_TIMEOUT = 600
 
-def transcribe_audio(audio_path: str) -> str:
+@lru_cache(maxsize=1)
+def get_whisper_model(name: str = "base"):
+    """
+    Load the local Whisper model once per process and reuse it.
+    
+    Uses fp16 on a CUDA GPU when one is available, otherwise int8 on CPU.
+    
+    Args:
+        name: Name of the Whisper model to load
+        
+    Returns:
+        The loaded Whisper model
+    """
+    if ctranslate2.get_cuda_device_count() > 0:
+        return WhisperModel(name, device="cuda", compute_type="float16")
+    return WhisperModel(name, device="cpu", compute_type="int8")
+
+async def transcribe_audio(audio_path: str, api_key: Optional[str] = None) -> str:
     """
     Transcribe audio file with speaker diarization.
     
     Args:
         audio_path: Path to the audio file
+        api_key: OpenAI API key; defaults to the OPENAI_API_KEY environment variable
         
     Returns:
         A formatted transcript with speaker identification
+        
+    Raises:
+        RuntimeError: If the local Whisper fallback fails
     """
-    # Try using OpenAI for transcription with diarization if API key is available
-    if openai.api_key:
-        try:
-            transcript = transcribe_with_openai(audio_path)
-            return transcript
-        except Exception as e:
-            print(f"OpenAI transcription failed: {str(e)}. Falling back to local Whisper model.")
-    
-    # Fallback to local Whisper model
-    transcript = transcribe_with_whisper(audio_path)
-    return transcript
+    parts = [piece async for piece in stream_transcript(audio_path, api_key)]
+    return "".join(parts).strip()
 
-def transcribe_with_openai(audio_path: str) -> str:
+async def transcribe_with_openai(audio_path: str, api_key: Optional[str] = None) -> str:
     """
     Use OpenAI's API to transcribe audio with diarization.
     
     Args:
         audio_path: Path to the audio file
+        api_key: OpenAI API key
         
     Returns:
         Formatted transcript with speaker identification
     """
+    client = get_openai_client(api_key)
     with open(audio_path, "rb") as audio_file:
-        response = openai.audio.transcriptions.create(
+        response = await client.audio.transcriptions.create(
             model="whisper-1",
             file=audio_file,
-            response_format="verbose_json"
+            response_format="verbose_json",
+            timeout=TRANSCRIPTION_TIMEOUT
         )
     
     # Process OpenAI response
@@ -52,7 +72,7 @@ def transcribe_with_openai(audio_path: str) -> str:
         segments = response["segments"]
         
         # Format transcript with speakers
-        formatted = ""
+        parts: List[str] = []
         current_speaker = None
         
         for segment in segments:
@@ -61,11 +81,11 @@ def transcribe_with_openai(audio_path: str) -> str:
             # Only add speaker label when speaker changes
             if speaker != current_speaker:
                 current_speaker = speaker
-                formatted += f"\n{speaker}: {segment['text']}"
+                parts.append(f"\n{speaker}: {segment['text']}")
             else:
-                formatted += f" {segment['text']}"
+                parts.append(f" {segment['text']}")
         
-        return formatted.strip()
+        return "".join(parts).strip()
     else:
         # If no diarization in response, format without speakers
         if hasattr(response, "text"):
@@ -75,43 +95,106 @@ def transcribe_with_openai(audio_path: str) -> str:
         else:
             return "Unable to transcribe audio with OpenAI API"
 
-def transcribe_with_whisper(audio_path: str) -> str:
+def iter_whisper_blocks(audio_path: str) -> Iterator[str]:
     """
-    Use local Whisper model to transcribe audio.
+    Transcribe audio with the local Whisper model, yielding speaker blocks as they are decoded.
     
     Args:
         audio_path: Path to the audio file
         
-    Returns:
-        Transcript (without speaker identification)
+    Yields:
+        Transcript blocks (without speaker identification)
     """
-    try:
-        # Load Whisper model (small is a good balance between accuracy and speed)
-        model = whisper.load_model("base")
-        
-        # Transcribe audio
-        result = model.transcribe(audio_path)
-        
-        # Format the result without diarization (since local Whisper doesn't do diarization)
-        segments = result.get("segments", [])
-        formatted_transcript = ""
-        
-        current_text_chunk = ""
-        
-        # Group segments into reasonable chunks
-        for segment in segments:
-            current_text_chunk += segment.get("text", "")
-            
-            # Start a new speaker chunk every few segments to simulate diarization
-            if len(current_text_chunk) > 200:  # Arbitrary length to create speaker blocks
-                formatted_transcript += f"\nSpeaker: {current_text_chunk}\n"
-                current_text_chunk = ""
+    # Get the cached Whisper model (base is a good balance between accuracy and speed)
+    model = get_whisper_model("base")
+    
+    # Transcribe audio (segments are produced lazily as decoding progresses)
+    segments, _ = model.transcribe(audio_path)
+    
+    # Format the result without diarization (since local Whisper doesn't do diarization)
+    current_text_chunk: List[str] = []
+    current_length = 0
+    
+    # Group segments into reasonable chunks
+    for segment in segments:
+        text = segment.text
+        current_text_chunk.append(text)
+        current_length += len(text)
         
-        # Add any remaining text
-        if current_text_chunk:
-            formatted_transcript += f"\nSpeaker: {current_text_chunk}\n"
+        # Start a new speaker chunk every few segments to simulate diarization
+        if current_length > 200:  # Arbitrary length to create speaker blocks
+            yield f"\nSpeaker: {''.join(current_text_chunk)}\n"
+            current_text_chunk = []
+            current_length = 0
+    
+    # Add any remaining text
+    if current_length:
+        yield f"\nSpeaker: {''.join(current_text_chunk)}\n"
+
+async def stream_transcript(
+    audio_path: str,
+    api_key: Optional[str] = None,
+    on_fallback: Optional[Callable[[Exception], None]] = None
+) -> AsyncIterator[str]:
+    """
+    Transcribe audio file, yielding the transcript in pieces as soon as they are available.
+    
+    The OpenAI API returns the whole transcript at once; the local Whisper fallback yields
+    each speaker block while the rest of the file is still being decoded. Joining the
+    pieces and stripping gives the full transcript (see transcribe_audio).
+    
+    Args:
+        audio_path: Path to the audio file
+        api_key: OpenAI API key; defaults to the OPENAI_API_KEY environment variable
+        on_fallback: Called with the error when the OpenAI call fails and a fallback is used
         
-        return formatted_transcript.strip()
+    Yields:
+        Consecutive pieces of the formatted transcript
         
-    except Exception as e:
-        return f"Transcription failed: {str(e)}"
\ No newline at end of file
+    Raises:
+        RuntimeError: If the local Whisper fallback fails
+    """
+    # Try using OpenAI for transcription with diarization if API key is available
+    api_key = api_key or os.getenv("OPENAI_API_KEY")
+    if api_key:
+        transcript = None
+        try:
+            transcript = await transcribe_with_openai(audio_path, api_key)
+        except Exception as e:
+            print(f"OpenAI transcription failed: {str(e)}. Falling back to local Whisper model.")
+            if on_fallback:
+                on_fallback(e)
+        if transcript is not None:
+            yield transcript
+            return
+    
+    # Fallback to local Whisper model, decoding in a worker thread and handing blocks back to the loop
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    stop = threading.Event()
+    done = object()
+    
+    def produce() -> None:
+        try:
+            for block in iter_whisper_blocks(audio_path):
+                if stop.is_set():
+                    return
+                loop.call_soon_threadsafe(queue.put_nowait, block)
+            loop.call_soon_threadsafe(queue.put_nowait, done)
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, e)
+    
+    producer = loop.run_in_executor(None, produce)
+    try:
+        while True:
+            item = await queue.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise RuntimeError(f"Transcription failed: {str(item)}") from item
+            yield item
+    finally:
+        # Let the worker thread stop early if the consumer went away
+        stop.set()
+    
+    await producer
\ No newline at end of file